@@ -149,7 +149,7 @@ class BamLoader:
         gsize = self.gsize
         template_extension = self.template_extension
         resolution = garray.resolution
-        dtype = garray.typecode
+        dtype = garray.value_typecode
         min_mapq = self.min_mapq
         pairedend = self.pairedend
 
@@ -164,6 +164,10 @@ class BamLoader:
 
                 array = np.zeros((length, 2), dtype=dtype)
 
+                # read positions on the forward and reverse strand
+                # are collected first and then counted in one go.
+                positions = ([], [])
+
                 for aln in aln_file.fetch(str(process_chrom)):
 
                     if aln.is_unmapped:
@@ -223,13 +227,17 @@ class BamLoader:
                             continue
 
                     # fill up the read strand specifically
-                    if aln.is_reverse:
-                        array[pos, 1] += 1
-                    else:
-                        array[pos, 0] += 1
+                    positions[1 if aln.is_reverse else 0].append(pos)
+
+                for strand, strand_positions in enumerate(positions):
+                    pos, counts = np.unique(np.asarray(strand_positions, dtype='int64'),
+                                            return_counts=True)
+                    if np.issubdtype(array.dtype, np.integer):
+                        counts = np.minimum(counts, np.iinfo(array.dtype).max)
+                    array[pos, strand] = counts
 
-                for interval in tmp_gsize:
-                    garray[interval, i] = array[interval.start:interval.end, :]
+                intervals = tmp_gsize[:]
+                garray.bulk_set(process_chrom, intervals['start'], intervals['end'], i, array)
             if self.verbose: bar.next()
         if self.verbose: bar.finish()
         return garray
@@ -263,7 +271,7 @@ class BigWigLoader:
         files = self.files
         gsize = self.gsize
         resolution = garray.resolution
-        dtype = garray.typecode
+        dtype = garray.value_typecode
         nan_to_num = self.nan_to_num
 
         if self.verbose: bar = Bar('Loading bigwig files'.format(len(files)), max=len(files))
@@ -285,8 +293,8 @@ class BigWigLoader:
 
                 array[:len(values), 0] = values
 
-                for interval in tmp_gsize:
-                    garray[interval, i] = array[int(interval.start):int(interval.end), :]
+                intervals = tmp_gsize[:]
+                garray.bulk_set(process_chrom, intervals['start'], intervals['end'], i, array)
             if self.verbose: bar.next()
         if self.verbose: bar.finish()
         return garray
@@ -378,32 +386,28 @@ class BedLoader:
                     array[region.start:region.end, 1] = 1
 
                 # map the signal onto the region of interest
+                starts, ends = [], []
                 for roireg in roifile.intersect(BedTool([Interval(process_chrom,
                                                                   0, length)]), wa=True, u=True):
-
-                    if roireg.end <= length:
-                        tmp_array = array[roireg.start:roireg.end]
-                    else:
-                        tmp_array = np.zeros((roireg.length, 2))
-                        tmp_array[:array[roireg.start:].shape[0]] = \
-                            array[roireg.start:]
                     if self.minoverlap is not None:
-                        if tmp_array[:, :1].nonzero()[0].shape[0]/roireg.length < \
+                        if np.count_nonzero(array[roireg.start:roireg.end, 0])/roireg.length < \
                             self.minoverlap:
                             # minimum overlap not achieved, skip
                             continue
-
-                    if mode == 'score':
-                        garray[roireg, i] = tmp_array[:, :1]
-                    elif mode == 'categorical':
-                        tmp_cat = np.zeros((roireg.length, 1, int(tmp_array.max())+1), dtype=dtype)
-                        tmp_cat[np.arange(roireg.length), 0, tmp_array[:, 0].astype('int')] = tmp_array[:, 1]
-
-                        for r in range(tmp_cat.shape[-1]):
-                            garray[roireg, r] = tmp_cat[:, :, r]
-
-                    else:
-                        garray[roireg, i] = tmp_array[:, :1]
+                    starts.append(roireg.start)
+                    ends.append(roireg.end)
+
+                if mode == 'categorical':
+                    # each category is stored as a separate condition
+                    # which indicates the presence of the category.
+                    ncategories = int(max([array[start:end].max(initial=0)
+                                           for start, end in zip(starts, ends)], default=-1)) + 1
+                    for r in range(ncategories):
+                        garray.bulk_set(process_chrom, starts, ends, r,
+                                        np.where(array[:, :1].astype('int') == r,
+                                                 array[:, 1:], 0).astype(dtype))
+                else:
+                    garray.bulk_set(process_chrom, starts, ends, i, array[:, :1])
                 if self.verbose: bar.next()
 
         if self.verbose: bar.finish()
@@ -493,6 +497,7 @@ class Cover(Dataset):
                         resolution=1,
                         storage='ndarray',
                         dtype='float32',
+                        scale=None,
                         stranded=True,
                         overwrite=False,
                         pairedend='5prime',
@@ -569,7 +574,15 @@ class Cover(Dataset):
             'ndarray', 'hdf5' or 'sparse'. Default: 'ndarray'.
         dtype : str
             Typecode to be used for storage the data.
-            Default: 'int'.
+            Read counts may also be stored using a compact integer typecode,
+            e.g. 'uint16' or 'uint8', to reduce the memory footprint.
+            In this case, counts that exceed the range of the typecode
+            are clipped. Default: 'float32'.
+        scale : float or None
+            Quantization step for integer typecodes. If not None,
+            the values are stored as :code:`round(value / scale)` and
+            returned as :code:`float32(stored) * scale`.
+            Can not be combined with a normalizer. Default: None.
         stranded : boolean
             Indicates whether to extract stranded or
             unstranded coverage. For unstranded
@@ -683,7 +696,7 @@ class Cover(Dataset):
             files = copy.copy(bamfiles)
 
             parameters = [gsize.tostr(), min_mapq,
-                          resolution, storage, dtype, stranded,
+                          resolution, storage, dtype, scale, stranded,
                           pairedend, zero_padding,
                           store_whole_genome, version]
             if not store_whole_genome:
@@ -703,6 +716,7 @@ class Cover(Dataset):
                                      conditions=conditions,
                                      overwrite=overwrite,
                                      typecode=dtype,
+                                     scale=scale,
                                      store_whole_genome=store_whole_genome,
                                      resolution=resolution,
                                      loader=bamloader,
@@ -722,6 +736,7 @@ class Cover(Dataset):
                            resolution=1,
                            flank=0, storage='ndarray',
                            dtype='float32',
+                           scale=None,
                            overwrite=False,
                            datatags=None, cache=False,
                            store_whole_genome=False,
@@ -790,6 +805,12 @@ class Cover(Dataset):
         dtype : str
             Typecode to define the datatype to be used for storage.
             Default: 'float32'.
+        scale : float or None
+            Quantization step for integer typecodes. If not None,
+            the signal is stored compactly as :code:`round(value / scale)`,
+            e.g. with dtype='uint16', and returned as
+            :code:`float32(stored) * scale`.
+            Can not be combined with a normalizer. Default: None.
         overwrite : boolean
             Overwrite cachefiles. Default: False.
         datatags : list(str) or None
@@ -894,7 +915,7 @@ class Cover(Dataset):
         if cache:
             files = copy.copy(bigwigfiles)
             parameters = [gsize.tostr(),
-                          resolution, storage, dtype,
+                          resolution, storage, dtype, scale,
                           zero_padding,
                           collapser.__name__ if hasattr(collapser, '__name__') else collapser,
                           store_whole_genome, nan_to_num, version]
@@ -915,6 +936,7 @@ class Cover(Dataset):
                                      resolution=resolution,
                                      store_whole_genome=store_whole_genome,
                                      typecode=dtype,
+                                     scale=scale,
                                      loader=bigwigloader,
                                      collapser=collapser_,
                                      normalizer=normalizer,
@@ -443,8 +443,8 @@ class Bioseq(Dataset):
         stepsize = 1
 
         gindexer = GenomicIndexer(reglen, stepsize, flank, zero_padding=False)
-        for chrom in chroms:
-            gindexer.add_interval(chrom, 0, reglen, '.')
+        gindexer.add_intervals(chroms, [0] * len(chroms),
+                               [reglen] * len(chroms), ['.'] * len(chroms))
 
         garray = cls._make_genomic_array(name, gindexer, seqs, order, storage,
                                          cache=cache, datatags=datatags,
@@ -6,6 +6,85 @@ from sklearn.utils import check_random_state
 
 from janggu.utils import _get_genomic_reader
 
+# '?' denotes an unknown strand (e.g. in GFF3 files)
+STRANDS = ('+', '-', '.', '?')
+STRANDMAP = {k: i for i, k in enumerate(STRANDS)}
+INTERVAL_DTYPE = [('chrom', 'object'), ('start', 'int64'),
+                  ('end', 'int64'), ('strand', 'object')]
+
+
+def _encode_strand(strands):
+    """Converts a list of strand symbols to integer codes."""
+    try:
+        return np.asarray([STRANDMAP[strand] for strand in strands], dtype='int8')
+    except KeyError as err:
+        raise ValueError('Unknown strand symbol {}. Strand must be one of {}.'
+                         .format(err, STRANDS))
+
+
+def _get_bins(starts, ends, binsize, stepsize, zero_padding):
+    """Splits a set of intervals into bins.
+
+    Parameters
+    ----------
+    starts : numpy.ndarray
+        Interval starts.
+    ends : numpy.ndarray
+        Interval ends.
+    binsize : int or None
+        Binsize in base pairs. If None, each interval
+        is represented by a single bin of its own length.
+    stepsize : int or None
+        Stepsize in base pairs. If None, stepsize is set equal to binsize.
+    zero_padding : boolean
+        Whether to record a variable length fragment at the end of an interval.
+
+    Returns
+    -------
+    tuple
+        Tuple of arrays (regidx, binstarts, binends) where regidx
+        contains the index of the original interval for each bin.
+    """
+    starts = np.asarray(starts, dtype='int64')
+    ends = np.asarray(ends, dtype='int64')
+    length = ends - starts
+
+    if binsize is None:
+        binsize = length
+    else:
+        binsize = np.full_like(length, binsize)
+
+    if stepsize is None:
+        stepsize = binsize
+    else:
+        stepsize = np.full_like(length, stepsize)
+
+    val = np.where(stepsize <= binsize, length - binsize + stepsize, length)
+
+    reglen = val // stepsize
+    nbins = np.maximum(reglen, 0)
+    # if there is a variable length fragment at the end,
+    # we record the remaining fragment length
+    if zero_padding:
+        nbins_total = nbins + (val % stepsize > 0)
+    else:
+        nbins_total = nbins
+
+    regidx = np.repeat(np.arange(len(starts)), nbins_total)
+    # position of each bin within its interval,
+    # i.e. the running bin index minus the first bin index of the interval
+    offsets = np.cumsum(nbins_total) - nbins_total
+    inregionidx = np.arange(len(regidx)) - np.repeat(offsets, nbins_total)
+
+    binstarts = starts[regidx] + inregionidx * stepsize[regidx]
+    binends = binstarts + binsize[regidx]
+
+    tail = inregionidx == nbins[regidx]
+    binstarts[tail] = (starts + stepsize * reglen)[regidx[tail]]
+    binends[tail] = ends[regidx[tail]]
+
+    return regidx, binstarts, binends
+
 
 class GenomicIndexer(object):  # pylint: disable=too-many-instance-attributes
     """GenomicIndexer maps a set of integer indices to respective
@@ -15,17 +94,11 @@ class GenomicIndexer(object):  # pylint: disable=too-many-instance-attributes
     array.
     """
 
-    _stepsize = None
-    _binsize = None
-    _flank = None
-    zero_padding = None
-    collapse = None
-    _randomidx = None
-    chrs = None
-    starts = None
-    strand = None
-    ends = None
-    _random_state = None
+    __slots__ = ('_binsize', '_stepsize', '_flank', 'zero_padding', 'collapse',
+                 '_randomidx', '_random_state',
+                 '_chrom_categories', '_chrom_codes', '_starts', '_ends', '_strand',
+                 '_chrom_slice', '_chrom_order', '_sorted_starts', '_max_length',
+                 '_decoded')
 
     @property
     def randomidx(self):
@@ -85,15 +158,22 @@ class GenomicIndexer(object):  # pylint: disable=too-many-instance-attributes
 
         regions_ = _get_genomic_reader(regions)
 
+        chroms, starts, ends, strands = [], [], [], []
+        for reg in regions_:
+            chroms.append(str(reg.chrom))
+            starts.append(int(reg.start))
+            ends.append(int(reg.end))
+            strands.append(str(reg.strand))
+
+        starts = np.asarray(starts, dtype='int64')
+        ends = np.asarray(ends, dtype='int64')
+
         if binsize is None and not collapse:
-            binsize_ = None
             # binsize will be inferred from bed file
-            for reg in regions_:
-                if binsize_ is None:
-                    binsize_ = reg.length
-                if reg.length != binsize_:
-                    raise ValueError('An interval length must be specified if collapse=False.')
-            binsize = binsize_
+            lengths = np.unique(ends - starts)
+            if len(lengths) > 1:
+                raise ValueError('An interval length must be specified if collapse=False.')
+            binsize = int(lengths[0]) if len(lengths) > 0 else None
 
         if stepsize is None:
             if binsize is None:
@@ -105,13 +185,7 @@ class GenomicIndexer(object):  # pylint: disable=too-many-instance-attributes
                    zero_padding=zero_padding,
                    collapse=collapse, random_state=random_state)
 
-        for reg in regions_:
-
-            gind.add_interval(
-                str(reg.chrom),
-                int(reg.start), int(reg.end), str(reg.strand))
-
-        return gind
+        return gind.add_intervals(chroms, starts, ends, strands)
 
     @classmethod
     def create_from_genomesize(cls, gsize):
@@ -129,9 +203,10 @@ class GenomicIndexer(object):  # pylint: disable=too-many-instance-attributes
 
         gind = cls(None, None, 0, zero_padding=False, collapse=False)
 
-        for chrom in gsize:
-
-            gind.add_interval(chrom, 0, gsize[chrom], '.')
+        chroms = list(gsize)
+        gind.add_intervals(chroms, [0] * len(chroms),
+                           [gsize[chrom] for chrom in chroms],
+                           ['.'] * len(chroms))
 
         return gind
 
@@ -193,41 +268,43 @@ class GenomicIndexer(object):  # pylint: disable=too-many-instance-attributes
             Interval start
         end : int
             Interval end
+        strand : str
+            Strand.
         """
+        return self.add_intervals([chrom], [start], [end], [strand])
 
-        binsize = self.binsize
-        stepsize = self.stepsize
-        zero_padding = self.zero_padding
-
-        if binsize is None:
-            binsize = end - start
+    def add_intervals(self, chroms, starts, ends, strands):
+        """Adds a set of intervals to a GenomicIndexer object.
 
-        if stepsize is None:
-            stepsize = binsize
-
-        if stepsize <= binsize:
-            val = (end - start - binsize + stepsize)
-        else:
-            val = (end - start)
-
-        reglen = val // stepsize
-        chrs = [chrom] * reglen
-        starts = [x for x in range(start, start+(stepsize*reglen), stepsize)]
-
-        ends = [x + binsize for x in starts]
-        strands = [strand] * reglen
-        # if there is a variable length fragment at the end,
-        # we record the remaining fragment length
-        if zero_padding and val % stepsize > 0:
-            chrs += [chrom]
-            starts += [start+(stepsize*reglen)]
-            ends += [end]
-            strands += [strand]
-
-        self.chrs += chrs
-        self.starts += starts
-        self.strand += strands
-        self.ends += ends
+        Parameters
+        ----------
+        chroms : list(str)
+            Chromosome names.
+        starts : list(int)
+            Interval starts
+        ends : list(int)
+            Interval ends
+        strands : list(str)
+            Strands.
+        """
+        return self._add_bins(np.asarray(chroms, dtype='object'),
+                              starts, ends, _encode_strand(strands))
+
+    def _add_bins(self, chroms, starts, ends, strands):
+        regidx, binstarts, binends = _get_bins(starts, ends,
+                                               self.binsize, self.stepsize,
+                                               self.zero_padding)
+
+        categories = np.union1d(self._chrom_categories, chroms)
+        self._chrom_codes = np.concatenate([
+            np.searchsorted(categories, self._chrom_categories)[self._chrom_codes],
+            np.searchsorted(categories, chroms)[regidx]]).astype('int32')
+        self._chrom_categories = categories
+        self._chrom_slice = None
+        self._decoded = None
+        self.starts = np.concatenate([self.starts, binstarts])
+        self.ends = np.concatenate([self.ends, binends])
+        self._strand = np.concatenate([self._strand, strands[regidx]])
         return self
 
     def add_gindexer(self, othergindexer):
@@ -239,11 +316,10 @@ class GenomicIndexer(object):  # pylint: disable=too-many-instance-attributes
             GenomicIndexer object.
         """
 
-        # add_interval ensures that the intervals from the other indexer
+        # _add_bins ensures that the intervals from the other indexer
         # are adapted according to the binsize and stepsize used in self
-        for region in othergindexer:
-            self.add_interval(region.chrom, region.start, region.end, region.strand)
-        return self
+        return self._add_bins(*othergindexer._get_intervals(  # pylint: disable=protected-access
+            np.arange(len(othergindexer))))
 
     def __init__(self, binsize, stepsize, flank=0, zero_padding=True,
                  collapse=False, random_state=None):
@@ -251,17 +327,23 @@ class GenomicIndexer(object):  # pylint: disable=too-many-instance-attributes
         self.binsize = binsize
         self.stepsize = stepsize
         self.flank = flank
-        self.chrs = []
-        self.starts = []
-        self.strand = []
-        self.ends = []
+        self._chrom_categories = np.empty(0, dtype='object')
+        self._chrom_codes = np.empty(0, dtype='int32')
+        self._chrom_slice = None
+        self._decoded = None
+        self._chrom_order = None
+        self._sorted_starts = None
+        self._max_length = None
+        self.starts = np.empty(0, dtype='int64')
+        self.ends = np.empty(0, dtype='int64')
+        self._strand = np.empty(0, dtype='int8')
         self.zero_padding = zero_padding
         self.collapse = collapse
         self.random_state = random_state
 
 
     def __len__(self):
-        return len(self.chrs)
+        return len(self._chrom_codes)
 
     def __repr__(self):  # pragma: no cover
         return "GenomicIndexer(<regions>, " \
@@ -270,20 +352,165 @@ class GenomicIndexer(object):  # pylint: disable=too-many-instance-attributes
                                                           self.flank)
 
     def __getitem__(self, index_):
-        if isinstance(index_, int):
-            if self.randomidx is not None:
+        if isinstance(index_, (int, np.integer)):
+            # this is called for every sample during training.
+            # therefore, the intervals are looked up in python lists.
+            if self._random_state is not None:
                 index = self.randomidx[index_]
             else:
                 index = index_
-            start = self.starts[index]
-            end = self.ends[index]
+            chroms, starts, ends, strands = self._decoded or self._get_decoded()
+            start = starts[index]
+            end = ends[index]
             if end == start:
                 end += 1
-            return Interval(self.chrs[index], max(0, start - self.flank),
-                            end + self.flank,
-                            strand=self.strand[index])
+            return Interval(chroms[index],
+                            max(0, start - self._flank),
+                            end + self._flank,
+                            strand=strands[index])
+
+        if isinstance(index_, (slice, list, np.ndarray)):
+            # batch query: the intervals are returned as a
+            # structured array rather than as a list of Interval objects
+            if isinstance(index_, slice):
+                index_ = np.arange(len(self))[index_]
+            chrs, starts, ends, strand = self._get_intervals(np.asarray(index_))
+            intervals = np.empty(len(chrs), dtype=INTERVAL_DTYPE)
+            intervals['chrom'] = chrs
+            intervals['start'] = starts
+            intervals['end'] = ends
+            intervals['strand'] = np.asarray(STRANDS, dtype='object')[strand]
+            return intervals
+
+        raise IndexError('Index support only for "int", "slice" or arrays. '
+                         'Given {}'.format(type(index_)))
+
+    def _get_intervals(self, index):
+        """Returns the flanked intervals for an array of indices.
 
-        raise IndexError('Index support only for "int". Given {}'.format(type(index_)))
+        Parameters
+        ----------
+        index : numpy.ndarray
+            Array of indices.
+
+        Returns
+        -------
+        tuple
+            Tuple of arrays (chrs, starts, ends, strand codes).
+        """
+        if self.randomidx is not None:
+            index = self.randomidx[index]
+
+        starts = self.starts[index]
+        ends = self.ends[index]
+        ends = np.where(ends == starts, ends + 1, ends)
+        return (self._chrom_categories[self._chrom_codes[index]],
+                np.maximum(starts - self.flank, 0),
+                ends + self.flank, self._strand[index])
+
+    @property
+    def chrs(self):
+        """chromosome names of the intervals"""
+        return self._chrom_categories[self._chrom_codes]
+
+    @chrs.setter
+    def chrs(self, value):
+        self._chrom_categories, codes = np.unique(np.asarray(value, dtype='object'),
+                                                  return_inverse=True)
+        self._chrom_codes = codes.astype('int32')
+        self._chrom_slice = None
+        self._decoded = None
+
+    @property
+    def starts(self):
+        """start positions of the intervals"""
+        return self._starts
+
+    @starts.setter
+    def starts(self, value):
+        self._starts = np.asarray(value, dtype='int64')
+        # the chromosome lookup table depends on the start positions
+        self._chrom_slice = None
+        self._decoded = None
+
+    @property
+    def ends(self):
+        """end positions of the intervals"""
+        return self._ends
+
+    @ends.setter
+    def ends(self, value):
+        self._ends = np.asarray(value, dtype='int64')
+        self._chrom_slice = None
+        self._decoded = None
+
+    def _get_decoded(self):
+        """Returns the intervals as lists of python objects.
+
+        Indexing a list is considerably faster than indexing
+        a numpy array and converting the element.
+        The lists are built on first use.
+        """
+        if self._decoded is None:
+            self._decoded = (self.chrs.tolist(), self._starts.tolist(),
+                             self._ends.tolist(), self.strand.tolist())
+        return self._decoded
+
+    def _get_chrom_slice(self):
+        """Returns the chromosome lookup table.
+
+        The lookup table maps each chromosome name to a tuple (lo, hi)
+        that marks the contiguous range of its intervals in the
+        ordering by chromosome and start position (see _chrom_order).
+        The table is built once on first use.
+        """
+        if self._chrom_slice is None:
+            order = np.lexsort((self.starts, self._chrom_codes))
+            bounds = np.searchsorted(self._chrom_codes[order],
+                                     np.arange(len(self._chrom_categories) + 1))
+            self._chrom_order = order
+            self._sorted_starts = self.starts[order]
+            self._max_length = int((self.ends - self.starts).max()) if len(self) > 0 else 0
+            self._chrom_slice = {chrom: (bounds[i], bounds[i + 1])
+                                 for i, chrom in enumerate(self._chrom_categories)}
+        return self._chrom_slice
+
+    def _idx_by_chrom_range(self, chrom, start=None, end=None):
+        """Returns the indices of the intervals of a chromosome that
+        overlap with [start, end).
+
+        The candidates are determined by binary search on the sorted
+        start positions such that only the matching range is scanned.
+        """
+        chrom_slice = self._get_chrom_slice()
+        if chrom not in chrom_slice:
+            return np.empty(0, dtype='int64')
+
+        lo, hi = chrom_slice[chrom]
+        if end is not None:
+            hi = lo + np.searchsorted(self._sorted_starts[lo:hi],
+                                      end + self.flank)
+        if start is not None:
+            # an interval can only reach into [start, end) if it
+            # starts at most _max_length bp before start.
+            lo = lo + np.searchsorted(self._sorted_starts[lo:hi],
+                                      start - self.flank - self._max_length,
+                                      side='right')
+
+        idxs = self._chrom_order[lo:hi]
+        if start is not None:
+            idxs = idxs[(self.ends[idxs] + self.flank) > start]
+        return idxs
+
+    @property
+    def strand(self):
+        """strand of the intervals"""
+        return np.asarray(STRANDS, dtype='object')[self._strand]
+
+    @strand.setter
+    def strand(self, value):
+        self._strand = _encode_strand(value)
+        self._decoded = None
 
     @property
     def binsize(self):
@@ -345,8 +572,8 @@ class GenomicIndexer(object):  # pylint: disable=too-many-instance-attributes
 
         Returns
         -------
-        idxs
-            Containing a list of filtered regions indexes.
+        numpy.ndarray
+            Containing the sorted indices of the filtered regions.
         """
 
         if isinstance(include, str):
@@ -355,30 +582,20 @@ class GenomicIndexer(object):  # pylint: disable=too-many-instance-attributes
         if isinstance(exclude, str):
             exclude = [exclude]
 
-        if not include:
-            idxs = set(range(len(self)))
+        if not include and start is None and end is None:
+            idxs = np.arange(len(self))
         else:
-            idxs = set()
-            for inc in include:
-                idxs.update(np.where(np.asarray(self.chrs) == inc)[0])
+            if not include:
+                include = self._chrom_categories
+            idxs = np.unique(np.concatenate(
+                [np.empty(0, dtype='int64')] +
+                [self._idx_by_chrom_range(chrom, start, end) for chrom in include]))
 
         if exclude:
-            for exc in exclude:
-                idxs = idxs.difference(
-                    np.where(np.asarray(self.chrs) == exc)[0])
-
-        if start is not None:
-            regionmatch = ((np.array(self.ends) + self.flank) > start)
-            indexmatch = np.where(regionmatch)[0]
-            idxs = idxs.intersection(indexmatch)
-
-        if end is not None:
-            regionmatch = ((np.array(self.starts) - self.flank) < end)
-            indexmatch = np.where(regionmatch)[0]
-            idxs = idxs.intersection(indexmatch)
+            excludeidxs = np.concatenate([np.empty(0, dtype='int64')] +
+                                         [self._idx_by_chrom_range(chrom) for chrom in exclude])
+            idxs = np.setdiff1d(idxs, excludeidxs, assume_unique=True)
 
-        idxs = list(idxs)
-        idxs.sort()
         return idxs
 
 
@@ -418,10 +635,11 @@ class GenomicIndexer(object):  # pylint: disable=too-many-instance-attributes
                                       zero_padding=self.zero_padding,
                                       collapse=self.collapse,
                                       random_state=self.random_state)
-        new_gindexer.chrs = [self.chrs[i] for i in idxs]
-        new_gindexer.starts = [self.starts[i] for i in idxs]
-        new_gindexer.strand = [self.strand[i] for i in idxs]
-        new_gindexer.ends = [self.ends[i] for i in idxs]
+        new_gindexer._chrom_categories = self._chrom_categories  # pylint: disable=protected-access
+        new_gindexer._chrom_codes = self._chrom_codes[idxs]  # pylint: disable=protected-access
+        new_gindexer.starts = self.starts[idxs]
+        new_gindexer.ends = self.ends[idxs]
+        new_gindexer._strand = self._strand[idxs]  # pylint: disable=protected-access
 
         return new_gindexer
 
@@ -434,15 +652,17 @@ class GenomicIndexer(object):  # pylint: disable=too-many-instance-attributes
             Bed file name
         """
 
+        chrs = self.chrs
+        strand = self.strand
         with open(filename, 'w') as handle:
             for i in range(len(self)):
                 handle.write('{chrom}\t{start}\t{end}\t{name}\t{score}\t{strand}\n'.format(
-                    chrom=self.chrs[i],
+                    chrom=chrs[i],
                     start=max(0, self.starts[i] - self.flank),
                     end=self.ends[i] + self.flank,
                     name='-',
                     score='-',
-                    strand=self.strand[i]))
+                    strand=strand[i]))
 
 
 def check_gindexer_compatibility(gindexer, resolution, store_whole_genome):
@@ -1,7 +1,10 @@
 """Genomic arrays"""
 
 import hashlib
+import json
 import os
+import threading
+from collections import OrderedDict
 
 import h5py
 import numpy as np
@@ -12,6 +15,17 @@ from janggu.utils import _get_output_data_location
 from janggu.utils import _iv_to_str
 from janggu.utils import _str_to_iv
 
+# size of the HDF5 chunk cache in bytes that is used while loading
+# a HDF5GenomicArray. Note that HDF5 allocates the cache
+# for each dataset (i.e. each chromosome) separately.
+RDCC_NBYTES = 1024 ** 2
+# number of positions along the genomic axis that are stored in one chunk
+CHUNKLEN = 4096
+# size in bytes of the chunks kept in memory by a HDF5GenomicArray
+# for reading. In contrast to the HDF5 chunk cache (which is disabled
+# for reading), this cache is shared across all chromosomes.
+CHUNK_CACHE_NBYTES = 32 * 1024 ** 2
+
 
 def _get_iv_length(length, resolution):
     """obtain the chromosome length for a given resolution."""
@@ -79,6 +93,10 @@ def _load_data(cachestr, tags, fileending):
         return False
     return True
 
+def _get_memmap_file(cachefile):
+    """ Determine the location of the array file of a memmap cache """
+    return os.path.splitext(cachefile)[0] + '.npy'
+
 class GenomicArray(object):  # pylint: disable=too-many-instance-attributes
     """GenomicArray stores multi-dimensional genomic information.
 
@@ -106,16 +124,23 @@ class GenomicArray(object):  # pylint: disable=too-many-instance-attributes
         Order of the alphabet size. Only relevant for Bioseq Datasets. Default: 1.
     collapser : None or callable
         Method to aggregate values along a given interval.
+    scale : float or None
+        If not None, the values are quantized by storing
+        :code:`round(value / scale)` with the integer typecode
+        and they are returned as :code:`float32(stored) * scale`.
+        Default: None.
     """
-    handle = dict()
-    _condition = None
-    _resolution = None
-    _order = None
-    region2index = None
+
+    __slots__ = ('handle', 'region2index', 'stranded', '_condition', '_order',
+                 'padding_value', '_resolution', 'typecode', '_typerange',
+                 '_full_genome_stored', 'collapser', 'scale')
 
     def __init__(self, stranded=True, conditions=None, typecode='d',
                  resolution=1, padding_value=0.,
-                 order=1, store_whole_genome=True, collapser=None):
+                 order=1, store_whole_genome=True, collapser=None,
+                 scale=None):
+        self.handle = {}
+        self.region2index = None
         self.stranded = stranded
         if conditions is None:
             conditions = ['sample']
@@ -128,18 +153,45 @@ class GenomicArray(object):  # pylint: disable=too-many-instance-attributes
 
         self.resolution = resolution
         self.typecode = typecode
+        # values are clipped to the range of integer typecodes,
+        # such that compact typecodes (e.g. 'uint8') saturate instead of overflow.
+        if np.issubdtype(np.dtype(typecode), np.integer):
+            self._typerange = np.iinfo(typecode)
+        else:
+            self._typerange = None
         self._full_genome_stored = store_whole_genome
         self.collapser = collapser
 
-    def _get_indices(self, interval, arraylen):
+        if scale is not None:
+            if self._typerange is None:
+                raise ValueError('scale requires an integer typecode, got {}'.format(typecode))
+            if scale <= 0:
+                raise ValueError('scale must be positive')
+            if padding_value != 0:
+                raise ValueError('scale is only supported with padding_value=0')
+        self.scale = scale
+
+    @property
+    def value_typecode(self):
+        """Datatype of the values that are set and returned.
+
+        This is the typecode, unless the values are quantized using scale.
+        """
+        return self.typecode if self.scale is None else 'float32'
+
+    def _get_indices(self, chrom, start, end, arraylen):
         """Given the original genomic coordinates,
            the array indices of the reference dataset (garray.handle)
            and the array indices of the view are returned.
 
         Parameters
         ----------
-        interval : Interval
-            Interval containing (chr, start, end)
+        chrom : str
+            Chromosome name.
+        start : int
+            Interval start.
+        end : int
+            Interval end.
         arraylen : int
             Length of the numpy target array.
 
@@ -152,12 +204,16 @@ class GenomicArray(object):  # pylint: disable=too-many-instance-attributes
             while array_[start,end] indicates the slice in the
             target array / view.
         """
-        chrom = interval.chrom
-        start = self.get_iv_start(interval.start)
-        end = self.get_iv_end(interval.end) - self.order + 1
+        start = self.get_iv_start(start)
+        end = self.get_iv_end(end) - self.order + 1
 
-        if start >= self.handle[chrom].shape[0]:
+        if start >= self.handle[chrom].shape[0] or end <= 0:
             return 0, 0, 0, 0
+
+        if start < 0:
+            # the region reaches out of the chromosome start
+            array_start = -start
+            ref_start = 0
         else:
             array_start = 0
             ref_start = start
@@ -174,6 +230,32 @@ class GenomicArray(object):  # pylint: disable=too-many-instance-attributes
     def __setitem__(self, index, value):
         interval = index[0]
         condition = index[1]
+
+        if isinstance(interval, Interval) and isinstance(condition, (int, slice)):
+            self.set(interval.chrom, interval.start, interval.end, condition, value)
+        else:
+            raise IndexError("Index must be a Interval and a condition index")
+
+    def set(self, chrom, start, end, condition, value):  # pylint: disable=too-many-arguments
+        """Sets the values for a genomic interval.
+
+        This method is equivalent to
+        :code:`garray[Interval(chrom, start, end), condition] = value`,
+        but does not require to construct an Interval object.
+
+        Parameters
+        ----------
+        chrom : str
+            Chromosome name.
+        start : int
+            Interval start.
+        end : int
+            Interval end.
+        condition : int or slice
+            Condition index.
+        value : numpy.ndarray
+            Values to be stored.
+        """
         if isinstance(condition, slice) and value.ndim != 3:
             raise ValueError('Expected 3D array with condition slice.')
         if isinstance(condition, slice):
@@ -185,38 +267,95 @@ class GenomicArray(object):  # pylint: disable=too-many-instance-attributes
         if not self.stranded and value.shape[1] != 1:
             value = value.sum(axis=1, keepdims=True)
 
-        if isinstance(interval, Interval) and isinstance(condition, (int, slice)):
-            start = self.get_iv_start(interval.start)
-            end = self.get_iv_end(interval.end)
+        length = self.get_iv_end(end) - self.get_iv_start(start) - self.order + 1
+        # value should be a 2 dimensional array
+        # it will be reshaped to a 2D array where the collapse operation is performed
 
-            length = end - start - self.order + 1
-            # value should be a 2 dimensional array
-            # it will be reshaped to a 2D array where the collapse operation is performed
+        # along the second dimension.
+        value = self._do_collapse(end - start, value)
 
-            # along the second dimension.
-            value = self._do_collapse(interval, value)
+        if self.scale is not None:
+            value = np.round(value / self.scale)
 
-            try:
-                self._setitem(interval, condition, length, value)
-
-            except KeyError:
-                # we end up here if the peak regions are not a subset of
-                # the regions of interest. that might be the case if
-                # peaks from the holdout proportion of the genome are tried
-                # to be added.
-                # unfortunately, it is also possible that store_whole_genome=False
-                # and the peaks and regions of interest are just not synchronized
-                # in which case nothing (or too few peaks) are added. in the latter
-                # case an error would help actually, but I am not sure how to
-                # check if the first or the second is the case here.
-                pass
-        else:
-            raise IndexError("Index must be a Interval and a condition index")
+        if self._typerange is not None:
+            value = np.clip(value, self._typerange.min, self._typerange.max)
+
+        try:
+            self._setitem(chrom, start, end, condition, length, value)
+
+        except KeyError:
+            # we end up here if the peak regions are not a subset of
+            # the regions of interest. that might be the case if
+            # peaks from the holdout proportion of the genome are tried
+            # to be added.
+            # unfortunately, it is also possible that store_whole_genome=False
+            # and the peaks and regions of interest are just not synchronized
+            # in which case nothing (or too few peaks) are added. in the latter
+            # case an error would help actually, but I am not sure how to
+            # check if the first or the second is the case here.
+            pass
+
+    def bulk_set(self, chrom, starts, ends, condition, values):  # pylint: disable=too-many-arguments
+        """Sets the values for several intervals of a chromosome at once.
+
+        For each interval, :code:`values[start:end]` is stored. This is
+        equivalent to calling :code:`set(chrom, start, end, condition, values[start:end])`
+        for each interval, but for in-memory arrays at base-pair resolution
+        all intervals are stored by a single vectorized assignment.
+
+        Parameters
+        ----------
+        chrom : str
+            Chromosome name.
+        starts : array-like(int)
+            Interval starts.
+        ends : array-like(int)
+            Interval ends.
+        condition : int
+            Condition index.
+        values : numpy.ndarray
+            Signal along the chromosome of shape (length, strand).
+            Positions beyond the end of the signal are set to zero.
+        """
+        # positions before the chromosome start are not stored
+        starts = np.maximum(np.asarray(starts, dtype='int64'), 0)
+        ends = np.asarray(ends, dtype='int64')
+        if len(starts) == 0:
+            return
+
+        if values.shape[0] < ends.max():
+            values = np.concatenate([values, np.zeros((ends.max() - values.shape[0],) +
+                                                      values.shape[1:], dtype=values.dtype)])
+
+        if not (self._full_genome_stored and self.resolution == 1 and self.order == 1
+                and self.scale is None and isinstance(self.handle.get(chrom), np.ndarray)):
+            for start, end in zip(starts, ends):
+                self.set(chrom, start, end, condition, values[start:end])
+            return
+
+        if self.stranded and values.shape[1] != 2:
+            raise ValueError('If genomic array is in stranded mode, shape[-1] == 2 is expected')
+
+        # positions of all intervals that lie within the chromosome
+        chromlen = self.handle[chrom].shape[0]
+        starts = np.minimum(starts, chromlen)
+        lengths = np.maximum(np.minimum(ends, chromlen) - starts, 0)
+        offsets = np.cumsum(lengths) - lengths
+        idx = np.arange(lengths.sum()) + np.repeat(starts - offsets, lengths)
 
-    def _setitem(self, interval, condition, length, value):
+        value = values[idx]
+        if not self.stranded and value.shape[1] != 1:
+            value = value.sum(axis=1, keepdims=True)
+
+        if self._typerange is not None:
+            value = np.clip(value, self._typerange.min, self._typerange.max)
+
+        self.handle[chrom][idx, :, condition] = value
+
+    def _setitem(self, chrom, start, end,  # pylint: disable=too-many-arguments
+                 condition, length, value):
         if not self._full_genome_stored:
-            idx = self.region2index[_iv_to_str(interval.chrom, interval.start,
-                                               interval.end)]
+            idx = self.region2index[_iv_to_str(chrom, start, end)]
 
             # correcting for the overshooting starts and ends is not necessary
             # for partially loaded data
@@ -224,16 +363,16 @@ class GenomicArray(object):  # pylint: disable=too-many-instance-attributes
 
         else:
             ref_start, ref_end, array_start, \
-                array_end = self._get_indices(interval, value.shape[0])
-            self.handle[interval.chrom][ref_start:ref_end, :, condition] = \
+                array_end = self._get_indices(chrom, start, end, value.shape[0])
+            self.handle[chrom][ref_start:ref_end, :, condition] = \
                                value[array_start:array_end]
 
-    def _do_collapse(self, interval, value):
+    def _do_collapse(self, length, value):
         if self.collapser is not None:
 
             if self.resolution is None and value.shape[0] == 1 or \
                 self.resolution is not None and \
-                value.shape[0] == interval.length//self.resolution:
+                value.shape[0] == length//self.resolution:
                 # collapsing becomes obsolete, because the data has already
                 # the expected shape (after collapsing)
                 pass
@@ -261,55 +400,91 @@ class GenomicArray(object):  # pylint: disable=too-many-instance-attributes
     def __getitem__(self, index):
         # for now lets ignore everything except for chrom, start and end.
         if isinstance(index, Interval):
-            interval = index
-            chrom = interval.chrom
-            start = self.get_iv_start(interval.start)
-            end = self.get_iv_end(interval.end)
-
-            # original length
-            length = end-start - self.order + 1
-
-            if not self._full_genome_stored:
-                idx = self.region2index[_iv_to_str(chrom, interval.start, interval.end)]
-                # correcting for the overshooting starts and ends is not necessary
-                # for partially loaded data
-                return self._reshape(self.handle['data'][idx],
-                                     (length, 2 if self.stranded else 1,
-                                      len(self.condition)))
-
-            if chrom not in self.handle:
-                return np.ones((length, 2 if self.stranded else 1,
-                                len(self.condition)),
-                               dtype=self.typecode) * self.padding_value
-
-            if start >= 0 and end <= self.handle[chrom].shape[0]:
-                end = end - self.order + 1
-                # this is a short-cut, which does not require zero-padding
-                return self._reshape(self.handle[chrom][start:end],
-                                     (end-start, 2 if self.stranded else 1,
-                                      len(self.condition)))
-
-            # below is some functionality for zero-padding, in case the region
-            # reaches out of the chromosome size
-
-            if self.padding_value == 0.0:
-                data = np.zeros((length, 2 if self.stranded else 1,
-                                 len(self.condition)),
-                                dtype=self.typecode)
-            else:
-                data = np.ones((length, 2 if self.stranded else 1,
-                                len(self.condition)),
-                               dtype=self.typecode) * self.padding_value
+            return self.get(index.chrom, index.start, index.end)
 
-            ref_start, ref_end, array_start, array_end = self._get_indices(interval, data.shape[0])
+        raise IndexError("Index must be a Interval")
 
-            data[array_start:array_end, :, :] = self._reshape(self.handle[chrom][ref_start:ref_end],
-                                                              (ref_end - ref_start,
-                                                               2 if self.stranded else 1,
-                                                               len(self.condition)))
-            return data
+    def get(self, chrom, start, end):
+        """Returns the values for a genomic interval.
 
-        raise IndexError("Index must be a Interval")
+        This method is equivalent to :code:`garray[Interval(chrom, start, end)]`,
+        but does not require to construct an Interval object.
+
+        Parameters
+        ----------
+        chrom : str
+            Chromosome name.
+        start : int
+            Interval start.
+        end : int
+            Interval end.
+
+        Returns
+        -------
+        numpy.ndarray
+            Array of shape (length, strand, condition).
+        """
+        if self.scale is not None:
+            return self._get(chrom, start, end).astype('float32') * self.scale
+        return self._get(chrom, start, end)
+
+    def _get(self, chrom, start, end):
+        if self.resolution == 1 and self.order == 1 and self._full_genome_stored \
+                and chrom in self.handle and start >= 0 \
+                and end <= self.handle[chrom].shape[0]:
+            # short-cut for the common case of base-pair resolution
+            # data, which requires neither a coordinate conversion
+            # nor zero-padding.
+            return self._reshape(self._read(chrom, start, end),
+                                 (end - start, 2 if self.stranded else 1,
+                                  len(self.condition)))
+
+        ivstart = self.get_iv_start(start)
+        ivend = self.get_iv_end(end)
+
+        # original length
+        length = ivend - ivstart - self.order + 1
+
+        if not self._full_genome_stored:
+            idx = self.region2index[_iv_to_str(chrom, start, end)]
+            # correcting for the overshooting starts and ends is not necessary
+            # for partially loaded data
+            return self._reshape(self.handle['data'][idx],
+                                 (length, 2 if self.stranded else 1,
+                                  len(self.condition)))
+
+        if chrom not in self.handle:
+            return np.ones((length, 2 if self.stranded else 1,
+                            len(self.condition)),
+                           dtype=self.typecode) * self.padding_value
+
+        if ivstart >= 0 and ivend <= self.handle[chrom].shape[0]:
+            ivend = ivend - self.order + 1
+            # this is a short-cut, which does not require zero-padding
+            return self._reshape(self._read(chrom, ivstart, ivend),
+                                 (ivend - ivstart, 2 if self.stranded else 1,
+                                  len(self.condition)))
+
+        # below is some functionality for zero-padding, in case the region
+        # reaches out of the chromosome size
+
+        if self.padding_value == 0.0:
+            data = np.zeros((length, 2 if self.stranded else 1,
+                             len(self.condition)),
+                            dtype=self.typecode)
+        else:
+            data = np.ones((length, 2 if self.stranded else 1,
+                            len(self.condition)),
+                           dtype=self.typecode) * self.padding_value
+
+        ref_start, ref_end, array_start, array_end = self._get_indices(chrom, start, end,
+                                                                       data.shape[0])
+
+        data[array_start:array_end, :, :] = self._reshape(self._read(chrom, ref_start, ref_end),
+                                                          (ref_end - ref_start,
+                                                           2 if self.stranded else 1,
+                                                           len(self.condition)))
+        return data
 
     @property
     def condition(self):
@@ -331,6 +506,10 @@ class GenomicArray(object):  # pylint: disable=too-many-instance-attributes
             raise ValueError('resolution must be greater than zero')
         self._resolution = value
 
+    def _read(self, chrom, start, end):
+        # read the slice [start:end] from the reference dataset
+        return self.handle[chrom][start:end]
+
     def _reshape(self, data, shape):
         # shape not necessary here,
         # data should just fall through
@@ -420,14 +599,59 @@ class GenomicArray(object):  # pylint: disable=too-many-instance-attributes
 
     def get_iv_end(self, end):
         """obtain the chromosome length for a given resolution."""
+        if self.resolution == 1:
+            return end
         return _get_iv_length(end, self.resolution)
 
     def get_iv_start(self, start):
         """obtain the chromosome length for a given resolution."""
+        if self.resolution == 1:
+            return start
         if self.resolution is None:
             return 0
         return start // self.resolution
 
+def _get_datasets(h5file):
+    """Map dataset names to the h5py datasets of a file.
+
+    Looking up a dataset by name in an h5py file involves
+    parsing the name and a call to the HDF5 library.
+    Therefore, the dataset objects are fetched only once.
+    """
+    return {name: h5file[name] for name in h5file.keys()
+            if isinstance(h5file[name], h5py.Dataset)}
+
+
+def _get_rdcc_nslots(chunkbytes, nbytes=RDCC_NBYTES):
+    """Number of hash table slots for the HDF5 chunk cache.
+
+    HDF5 recommends about 100 times the number of chunks that
+    fit into the cache and a prime number to reduce collisions.
+    """
+    nslots = max(100 * nbytes // max(chunkbytes, 1), 2)
+    while any(nslots % i == 0 for i in range(2, int(nslots ** .5) + 1)):
+        nslots += 1
+    return nslots
+
+
+def _get_chunks(shape, chunklen=CHUNKLEN):
+    """Chunk layout for a HDF5 dataset.
+
+    A chunk spans up to chunklen positions along the genomic axis
+    including all strands and conditions, such that a typical interval
+    query only touches one or two chunks.
+    The chunks are stored without compression, because the datasets are
+    read many times during training and decompression would dominate
+    the access time.
+    """
+    if 0 in shape:
+        return None
+    if len(shape) == 3:
+        # store_whole_genome=True: (length, strand, condition)
+        return (min(chunklen, shape[0]),) + shape[1:]
+    # store_whole_genome=False: (region, length, strand, condition)
+    return (max(1, min(shape[0], chunklen // shape[1])),) + shape[1:]
+
 def init_with_padding_value(padding_value, shape, dtype):
     """ create array with given padding value. """
     if padding_value == 0.0:
@@ -473,10 +697,14 @@ class HDF5GenomicArray(GenomicArray):
         Function to be called for loading the genomic array.
     collapser : None or callable
         Method to aggregate values along a given interval.
+    scale : float or None
+        Quantization step for integer typecodes. Default: None.
     verbose : boolean
         Verbosity. Default: False
     """
 
+    __slots__ = ('_h5file', '_chunk_cache', '_chunk_nbytes', '_chunk_lock')
+
     def __init__(self, gsize,  # pylint: disable=too-many-locals
                  stranded=True,
                  conditions=None,
@@ -490,17 +718,23 @@ class HDF5GenomicArray(GenomicArray):
                  overwrite=False, loader=None,
                  normalizer=None,
                  collapser=None,
+                 scale=None,
                  verbose=False):
         super(HDF5GenomicArray, self).__init__(stranded, conditions, typecode,
                                                resolution,
                                                order=order,
                                                padding_value=padding_value,
                                                store_whole_genome=store_whole_genome,
-                                               collapser=collapser)
+                                               collapser=collapser,
+                                               scale=scale)
 
         if cache is None:
             raise ValueError('HDF5 format requires cache=True')
 
+        self._chunk_cache = OrderedDict()
+        self._chunk_nbytes = 0
+        self._chunk_lock = threading.Lock()
+
         gsize_ = None
 
         if not store_whole_genome:
@@ -513,44 +747,100 @@ class HDF5GenomicArray(GenomicArray):
         cachefile = _get_cachefile(cache, datatags, '.h5')
         load_from_file = _load_data(cache, datatags, '.h5')
 
+        nslots = _get_rdcc_nslots(CHUNKLEN * (2 if stranded else 1) * len(self.condition) *
+                                  np.dtype(self.typecode).itemsize)
+
         if load_from_file:
             if gsize_ is None:
                 gsize_ = gsize() if callable(gsize) else gsize
 
-            h5file = h5py.File(cachefile, 'w')
+            h5file = h5py.File(cachefile, 'w', rdcc_nbytes=RDCC_NBYTES,
+                               rdcc_nslots=nslots)
 
-            if store_whole_genome:
-                for region in gsize_:
-                    shape = (_get_iv_length(region.length - self.order + 1, self.resolution),
+            try:
+                if store_whole_genome:
+                    for region in gsize_:
+                        shape = (_get_iv_length(region.length - self.order + 1, self.resolution),
+                                 2 if stranded else 1, len(self.condition))
+                        h5file.create_dataset(str(region.chrom), shape,
+                                              dtype=self.typecode,
+                                              chunks=_get_chunks(shape),
+                                              fillvalue=padding_value)
+                else:
+                    shape = (len(gsize_),
+                             _get_iv_length(gsize_.binsize + 2*gsize_.flank - self.order + 1,
+                                            self.resolution),
                              2 if stranded else 1, len(self.condition))
-                    h5file.create_dataset(str(region.chrom), shape,
+                    h5file.create_dataset('data', shape,
                                           dtype=self.typecode,
-                                          data=init_with_padding_value(padding_value,
-                                                                       shape,
-                                                                       self.typecode))
-                    self.handle = h5file
-            else:
-                shape = (len(gsize_),
-                         _get_iv_length(gsize_.binsize + 2*gsize_.flank - self.order + 1,
-                                        self.resolution),
-                         2 if stranded else 1, len(self.condition))
-                h5file.create_dataset('data', shape,
-                                      dtype=self.typecode,
-                                      data=init_with_padding_value(padding_value,
-                                                                   shape,
-                                                                   self.typecode))
-                self.handle = h5file
-            # invoke the loader
-            if loader:
-                loader(self)
-
-            for norm in normalizer or []:
-                get_normalizer(norm)(self)
-            h5file.close()
+                                          chunks=_get_chunks(shape),
+                                          fillvalue=padding_value)
+                self.handle = _get_datasets(h5file)
+                # invoke the loader
+                if loader:
+                    loader(self)
+
+                for norm in normalizer or []:
+                    get_normalizer(norm)(self)
+            finally:
+                h5file.close()
         if verbose: print('reload {}'.format(cachefile))
-        h5file = h5py.File(cachefile, 'a', driver='stdio')
-
-        self.handle = h5file
+        # reading is served by the chunk cache below
+        h5file = h5py.File(cachefile, 'a', rdcc_nbytes=0)
+
+        # keep a reference to the file, while the handle only maps
+        # the dataset names to the (memoized) dataset objects.
+        self._h5file = h5file
+        self.handle = _get_datasets(h5file)
+
+    def _read(self, chrom, start, end):
+        # Adjacent and overlapping reads are typically served
+        # from the same chunks. Therefore, complete chunks are
+        # read and kept in a least-recently-used cache.
+        dataset = self.handle[chrom]
+        chunklen = dataset.chunks[0] if dataset.chunks is not None else 0
+
+        if end <= start or chunklen == 0:
+            return dataset[start:end]
+
+        first = start // chunklen
+        last = (end - 1) // chunklen
+        chunkbytes = dataset.dtype.itemsize * int(np.prod(dataset.chunks))
+
+        if (last - first + 1) * chunkbytes > CHUNK_CACHE_NBYTES:
+            # the region is too large to be served from the cache
+            return dataset[start:end]
+
+        if first == last:
+            offset = first * chunklen
+            return self._get_chunk(chrom, first, chunklen)[start - offset:end - offset].copy()
+
+        return np.concatenate([self._get_chunk(chrom, i, chunklen)[
+            max(start - i * chunklen, 0):end - i * chunklen] for i in range(first, last + 1)])
+
+    def _get_chunk(self, chrom, chunkidx, chunklen):
+        key = (chrom, chunkidx)
+        # the cache may be used concurrently, e.g. by threaded keras workers
+        with self._chunk_lock:
+            chunk = self._chunk_cache.pop(key, None)
+            if chunk is None:
+                chunk = self.handle[chrom][chunkidx * chunklen:(chunkidx + 1) * chunklen]
+                self._chunk_nbytes += chunk.nbytes
+                while self._chunk_cache and self._chunk_nbytes > CHUNK_CACHE_NBYTES:
+                    _, evicted = self._chunk_cache.popitem(last=False)
+                    self._chunk_nbytes -= evicted.nbytes
+            # (re-)insert the chunk as the most recently used one
+            self._chunk_cache[key] = chunk
+        return chunk
+
+    def _setitem(self, chrom, start, end,  # pylint: disable=too-many-arguments
+                 condition, length, value):
+        with self._chunk_lock:
+            super(HDF5GenomicArray, self)._setitem(chrom, start, end,
+                                                   condition, length, value)
+            # cached chunks might be outdated now
+            self._chunk_cache.clear()
+            self._chunk_nbytes = 0
 
 
 class NPGenomicArray(GenomicArray):
@@ -595,10 +885,14 @@ class NPGenomicArray(GenomicArray):
         Default: None.
     collapser : None or callable
         Method to aggregate values along a given interval.
+    scale : float or None
+        Quantization step for integer typecodes. Default: None.
     verbose : boolean
         Verbosity. Default: False
     """
 
+    __slots__ = ()
+
     def __init__(self, gsize,  # pylint: disable=too-many-locals
                  stranded=True,
                  conditions=None,
@@ -611,6 +905,7 @@ class NPGenomicArray(GenomicArray):
                  cache=None,
                  overwrite=False, loader=None,
                  normalizer=None, collapser=None,
+                 scale=None,
                  verbose=False):
 
         super(NPGenomicArray, self).__init__(stranded, conditions, typecode,
@@ -618,7 +913,8 @@ class NPGenomicArray(GenomicArray):
                                              order=order,
                                              padding_value=padding_value,
                                              store_whole_genome=store_whole_genome,
-                                             collapser=collapser)
+                                             collapser=collapser,
+                                             scale=scale)
 
         gsize_ = None
 
@@ -631,52 +927,73 @@ class NPGenomicArray(GenomicArray):
                                             region.end): i \
                                                 for i, region in enumerate(gsize_)}
 
-        cachefile = _get_cachefile(cache, datatags, '.npz')
-        load_from_file = _load_data(cache, datatags, '.npz')
+        cachefile = _get_cachefile(cache, datatags, '.json')
+        load_from_file = _load_data(cache, datatags, '.json')
 
         if load_from_file:
             if gsize_ is None:
                 gsize_ = gsize() if callable(gsize) else gsize
 
             if store_whole_genome:
-                data = {str(region.chrom): init_with_padding_value(
-                    padding_value,
-                    shape=(_get_iv_length(region.length - self.order + 1,
-                                          self.resolution),
-                           2 if stranded else 1,
-                           len(self.condition)),
-                    dtype=self.typecode) for region in gsize_}
-                names = [str(region.chrom) for region in gsize_]
-                self.handle = data
+                shapes = {str(region.chrom): (_get_iv_length(region.length - self.order + 1,
+                                                             self.resolution),
+                                              2 if stranded else 1,
+                                              len(self.condition)) for region in gsize_}
             else:
-                data = {'data': init_with_padding_value(
-                    padding_value,
-                    shape=(len(gsize_),
-                           _get_iv_length(gsize_.binsize + 2*gsize_.flank - self.order + 1,
-                                          self.resolution) if self.resolution is not None else 1,
-                           2 if stranded else 1,
-                           len(self.condition)),
-                    dtype=self.typecode)}
-                names = ['data']
-                self.handle = data
+                shapes = {'data': (len(gsize_),
+                                   _get_iv_length(gsize_.binsize + 2*gsize_.flank - self.order + 1,
+                                                  self.resolution) if self.resolution is not None else 1,
+                                   2 if stranded else 1,
+                                   len(self.condition))}
+            names = list(shapes)
+
+            if cachefile is None:
+                self.handle = {name: init_with_padding_value(padding_value,
+                                                             shape=shapes[name],
+                                                             dtype=self.typecode)
+                               for name in names}
+            else:
+                # all arrays are stored back to back along the first axis
+                # in a single .npy file, which is directly filled by the
+                # loader via a memory map. a single memory map
+                # avoids holding one file descriptor per chromosome.
+                offsets = np.cumsum([0] + [shapes[name][0] for name in names]).tolist()
+                data = np.lib.format.open_memmap(_get_memmap_file(cachefile),
+                                                 mode='w+', dtype=self.typecode,
+                                                 shape=(offsets[-1],) + shapes[names[0]][1:])
+                if padding_value != 0.0:
+                    data[:] = padding_value
+                self.handle = {name: data[offsets[i]:offsets[i + 1]]
+                               for i, name in enumerate(names)}
 
             # invoke the loader
             if loader:
                 loader(self)
 
-
             if cachefile is not None:
-                np.savez(cachefile, **data)
-
+                data.flush()
+                del data
+                # the meta data file is written last. it marks the cache as complete.
+                # therefore, it is serialized before the file is created.
+                meta = json.dumps({'names': names,
+                                   'offsets': offsets,
+                                   'shapes': [[int(dim) for dim in shapes[name]]
+                                              for name in names]})
+                with open(cachefile, 'w') as file_:
+                    file_.write(meta)
 
         if cachefile is not None:
             if verbose: print('reload {}'.format(cachefile))
-            data = np.load(cachefile)
-            names = [x for x in data]
+            with open(cachefile, 'r') as file_:
+                meta = json.load(file_)
+            names, offsets = meta['names'], meta['offsets']
 
-        # here we get either the freshly loaded data or the reloaded
-        # data from np.load.
-        self.handle = {key: data[key] for key in names}
+            # the array is mapped copy-on-write, which avoids reading the
+            # entire array upfront and keeps the cache file unaffected
+            # by the normalizers.
+            data = np.load(_get_memmap_file(cachefile), mmap_mode='c')
+            self.handle = {name: data[offsets[i]:offsets[i + 1]]
+                           for i, name in enumerate(names)}
 
         for norm in normalizer or []:
             get_normalizer(norm)(self)
@@ -725,10 +1042,14 @@ class SparseGenomicArray(GenomicArray):
         Default: None.
     collapser : None or callable
         Method to aggregate values along a given interval.
+    scale : float or None
+        Quantization step for integer typecodes. Default: None.
     verbose : boolean
         Verbosity. Default: False
     """
 
+    __slots__ = ()
+
     def __init__(self, gsize,  # pylint: disable=too-many-locals
                  stranded=True,
                  conditions=None,
@@ -742,6 +1063,7 @@ class SparseGenomicArray(GenomicArray):
                  overwrite=False,
                  loader=None,
                  collapser=None,
+                 scale=None,
                  verbose=False):
         super(SparseGenomicArray, self).__init__(stranded, conditions,
                                                  typecode,
@@ -749,7 +1071,8 @@ class SparseGenomicArray(GenomicArray):
                                                  order=order,
                                                  padding_value=padding_value,
                                                  store_whole_genome=store_whole_genome,
-                                                 collapser=collapser)
+                                                 collapser=collapser,
+                                                 scale=scale)
 
         cachefile = _get_cachefile(cache, datatags, '.npz')
         load_from_file = _load_data(cache, datatags, '.npz')
@@ -841,9 +1164,10 @@ class SparseGenomicArray(GenomicArray):
         else:
             return data.reshape(data.shape[1]//(shape[-2]*shape[-1]), shape[-2], shape[-1])
 
-    def _setitem(self, interval, condition, length, value):
+    def _setitem(self, chrom, start, end,  # pylint: disable=too-many-arguments
+                 condition, length, value):
         if not self._full_genome_stored:
-            regidx = self.region2index[_iv_to_str(interval.chrom, interval.start, interval.end)]
+            regidx = self.region2index[_iv_to_str(chrom, start, end)]
             nconditions = len(self.condition)
             ncondstrand = len(self.condition) * value.shape[-1]
             #end = end - self.order + 1
@@ -855,14 +1179,16 @@ class SparseGenomicArray(GenomicArray):
                 self.handle['data'][regidx,
                                     basepos + strand + cond] = value[idx]
         else:
-            ref_start, ref_end, array_start, _ = self._get_indices(interval, value.shape[0])
+            ref_start, _, array_start, array_end = self._get_indices(chrom, start, end,
+                                                                     value.shape[0])
+            # only the part of the values that lies within the chromosome is stored
+            value = value[array_start:array_end]
             idxs = np.where(value > 0)
-            iarray = np.arange(ref_start, ref_end)
             for idx in zip(*idxs):
                 cond = condition if isinstance(condition, int) else idx[2]
-                self.handle[interval.chrom][iarray[idx[0]],
-                                            idx[1] * len(self.condition)
-                                            + cond] = value[idx[0] + array_start][idx[1:]]
+                self.handle[chrom][ref_start + idx[0],
+                                   idx[1] * len(self.condition)
+                                   + cond] = value[idx]
 
 class PercentileTrimming(object):
     """Percentile trimming normalization.
@@ -1089,6 +1415,7 @@ def create_genomic_array(chroms, stranded=True, conditions=None, typecode='float
                          datatags=None, cache=None, overwrite=False,
                          loader=None,
                          normalizer=None, collapser=None,
+                         scale=None,
                          verbose=False):
     """Factory function for creating a GenomicArray.
 
@@ -1144,6 +1471,11 @@ def create_genomic_array(chroms, stranded=True, conditions=None, typecode='float
     collapser : str, callable or None
         Collapse method defines how the signal is aggregated for resolution>1 or resolution=None.
         For example, by summing the signal over a given interval.
+    scale : float or None
+        If not None, the values are stored as :code:`round(value / scale)`
+        using the integer typecode (e.g. 'uint8' or 'uint16') and returned as
+        :code:`float32(stored) * scale`. This allows to store real-valued
+        signals compactly. Default: None.
     verbose : boolean
         Verbosity. Default: False
     """
@@ -1160,6 +1492,11 @@ def create_genomic_array(chroms, stranded=True, conditions=None, typecode='float
               'with resolution=None. store_whole_genome=False is used instead.')
         store_whole_genome = False
 
+    if scale is not None and normalizer:
+        # the normalizers operate on the stored values,
+        # which would be truncated to the quantization grid.
+        raise ValueError('scale can not be combined with a normalizer.')
+
     if storage == 'hdf5':
         return HDF5GenomicArray(chroms, stranded=stranded,
                                 conditions=conditions,
@@ -1174,6 +1511,7 @@ def create_genomic_array(chroms, stranded=True, conditions=None, typecode='float
                                 loader=loader,
                                 normalizer=normalizer,
                                 collapser=get_collapser(collapser),
+                                scale=scale,
                                 verbose=verbose)
     elif storage == 'ndarray':
         return NPGenomicArray(chroms, stranded=stranded,
@@ -1189,6 +1527,7 @@ def create_genomic_array(chroms, stranded=True, conditions=None, typecode='float
                               loader=loader,
                               normalizer=normalizer,
                               collapser=get_collapser(collapser),
+                              scale=scale,
                               verbose=verbose)
     elif storage == 'sparse':
         return SparseGenomicArray(chroms, stranded=stranded,
@@ -1203,6 +1542,7 @@ def create_genomic_array(chroms, stranded=True, conditions=None, typecode='float
                                   overwrite=overwrite,
                                   loader=loader,
                                   collapser=get_collapser(collapser),
+                                  scale=scale,
                                   verbose=verbose)
 
     raise Exception("Storage type must be 'hdf5', 'ndarray' or 'sparse'")
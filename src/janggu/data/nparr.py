@@ -34,7 +34,7 @@ class Array(Dataset):
         self.data = copy.copy(array)
         self.conditions = conditions
 
-        Dataset.__init__(self, '{}'.format(name))
+        Dataset.__init__(self, str(name))
 
     def __repr__(self):  # pragma: no cover
         return 'Array("{}", <np.array>)'.format(self.name)
@@ -1202,10 +1202,10 @@ def input_attribution(model, inputs,  # pylint: disable=too-many-locals
 
     subgindexers = [copy.copy(gi) for gi in gindexers_save]
     for subgi in subgindexers:
-        subgi.chrs = [subgi.chrs[i] for i in idxs]
-        subgi.starts = [subgi.starts[i] for i in idxs]
-        subgi.ends = [subgi.ends[i] for i in idxs]
-        subgi.strand = [subgi.strand[i] for i in idxs]
+        subgi.chrs = subgi.chrs[idxs]
+        subgi.starts = subgi.starts[idxs]
+        subgi.ends = subgi.ends[idxs]
+        subgi.strand = subgi.strand[idxs]
 
     # assign it to the input datasets temporarily
     for inp, _ in enumerate(inputs):
@@ -1984,3 +1984,44 @@ def test_bedgraph():
     assert cover1.shape == (25, 200, 1, 1)
     assert cover1.shape == cover2.shape
     np.testing.assert_equal(cover1[:], cover2[:])
+
+
+def test_bam_counts_synthetic(tmpdir):
+    pysam = pytest.importorskip('pysam')
+    bamfile = tmpdir.join('synthetic.bam').strpath
+    header = {'HD': {'VN': '1.0', 'SO': 'coordinate'},
+              'SQ': [{'LN': 200, 'SN': 'chr1'}, {'LN': 100, 'SN': 'chr2'}]}
+
+    # (chromosome, start, reverse strand, number of reads)
+    reads = [(0, 10, False, 300), (0, 50, True, 3), (0, 50, False, 2), (1, 5, False, 1)]
+    with pysam.AlignmentFile(bamfile, 'wb', header=header) as bam:
+        for ref, start, reverse, nreads in reads:
+            for i in range(nreads):
+                aln = pysam.AlignedSegment()
+                aln.query_name = 'r{}_{}_{}'.format(ref, start, i)
+                aln.query_sequence = 'A' * 20
+                aln.query_qualities = pysam.qualitystring_to_array('I' * 20)
+                aln.reference_id = ref
+                aln.reference_start = start
+                aln.cigarstring = '20M'
+                aln.mapping_quality = 60
+                aln.flag = 16 if reverse else 0
+                bam.write(aln)
+    pysam.index(bamfile)
+
+    for dtype, saturated in [('int32', 300), ('uint8', 255)]:
+        cover = Cover.create_from_bam('synthetic', bamfile,
+                                      genomesize={'chr1': 200, 'chr2': 100},
+                                      store_whole_genome=True, dtype=dtype)
+
+        chr1 = cover.garray.get('chr1', 0, 200)
+        expected = np.zeros((200, 2, 1))
+        expected[10, 0] = saturated
+        expected[50, 0] = 2
+        # reads on the reverse strand are counted at their reference end
+        expected[70, 1] = 3
+        np.testing.assert_equal(chr1, expected)
+
+        chr2 = cover.garray.get('chr2', 0, 100)
+        np.testing.assert_equal(chr2.sum(), 1)
+        np.testing.assert_equal(chr2[5, 0, 0], 1)
@@ -1,10 +1,13 @@
 import os
+from itertools import product
+from multiprocessing.pool import ThreadPool
 
 import numpy as np
 import pytest
 from pybedtools import Interval
 
 from janggu.data import GenomicIndexer
+from janggu.data import LogTransform
 from janggu.data import create_genomic_array
 from janggu.data.genomicarray import get_collapser
 from janggu.data.genomicarray import get_normalizer
@@ -281,3 +284,270 @@ def test_check_resolution_collapse_compatibility(tmpdir):
                               storage="ndarray", cache=None, resolution=None, loader=loading,
                               collapser='sum',
                               normalizer=['tpm'])
+
+
+def test_hdf5_chunks(tmpdir):
+    os.environ['JANGGU_OUTPUT'] = tmpdir.strpath
+
+    ga = create_genomic_array(GenomicIndexer.create_from_genomesize({'chr1': 10000, 'chr2': 300}),
+                              stranded=True, conditions=['a', 'b', 'c'],
+                              typecode='float32', storage='hdf5', cache='chunks')
+    np.testing.assert_equal(ga.handle['chr1'].chunks, (4096, 2, 3))
+    np.testing.assert_equal(ga.handle['chr2'].chunks, (300, 2, 3))
+    assert ga.handle['chr1'].compression is None
+    # datasets are looked up once and memoized
+    assert ga.handle['chr1'] is ga.handle['chr1']
+
+    gi = GenomicIndexer.create_from_region('chr1', 0, 20000, '+',
+                                           binsize=200, stepsize=200)
+    ga = create_genomic_array(gi, stranded=False, typecode='float32',
+                              storage='hdf5', cache='chunks_roi',
+                              store_whole_genome=False)
+    np.testing.assert_equal(ga.handle['data'].chunks, (20, 200, 1, 1))
+
+
+def test_hdf5_padding_value(tmpdir):
+    os.environ['JANGGU_OUTPUT'] = tmpdir.strpath
+
+    def loading(garray):
+        garray[Interval('chr1', 10, 20), 0] = np.ones((10, 1))
+        return garray
+
+    for padding_value in [0., -1., np.nan]:
+        ga = create_genomic_array(GenomicIndexer.create_from_genomesize({'chr1': 10000}),
+                                  stranded=False, typecode='float32',
+                                  storage='hdf5', padding_value=padding_value,
+                                  cache='padding{}'.format(padding_value),
+                                  loader=loading)
+        np.testing.assert_equal(ga[Interval('chr1', 10, 20)], np.ones((10, 1, 1)))
+        np.testing.assert_equal(ga[Interval('chr1', 5000, 5010)],
+                                np.full((10, 1, 1), padding_value))
+
+
+def test_ndarray_cache_reload(tmpdir):
+    os.environ['JANGGU_OUTPUT'] = tmpdir.strpath
+
+    def loading(garray):
+        garray[Interval('chr1', 10, 20), 0] = np.ones((10, 1))
+        return garray
+
+    def no_loading(garray):
+        raise AssertionError('loader should not be called on reload')
+
+    for loader in [loading, no_loading]:
+        ga = create_genomic_array(GenomicIndexer.create_from_genomesize({'chr1': 150, 'chr2': 300}),
+                                  stranded=False, typecode='float32',
+                                  storage='ndarray', cache='reload',
+                                  loader=loader, normalizer=[LogTransform()])
+        assert isinstance(ga.handle['chr1'], np.memmap)
+        np.testing.assert_allclose(ga[Interval('chr1', 10, 20)],
+                                   np.log(2.) * np.ones((10, 1, 1)))
+        np.testing.assert_equal(ga[Interval('chr2', 10, 20)], np.zeros((10, 1, 1)))
+
+
+def test_ndarray_cache_many_contigs(tmpdir):
+    os.environ['JANGGU_OUTPUT'] = tmpdir.strpath
+    resource = pytest.importorskip('resource')
+
+    def loading(garray):
+        garray[Interval('chr2999', 0, 10), 0] = np.ones((10, 1))
+        return garray
+
+    gsize = GenomicIndexer.create_from_genomesize({'chr{}'.format(i): 100
+                                                   for i in range(3000)})
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(256, hard), hard))
+    try:
+        handles = [create_genomic_array(gsize, stranded=False, typecode='float32',
+                                        storage='ndarray', cache='many',
+                                        loader=loading) for _ in range(2)]
+    finally:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+
+    for ga in handles:
+        assert len(ga.handle) == 3000
+        np.testing.assert_equal(ga[Interval('chr2999', 0, 20)][:, 0, 0],
+                                [1] * 10 + [0] * 10)
+        np.testing.assert_equal(ga[Interval('chr0', 0, 20)], np.zeros((20, 1, 1)))
+
+
+def test_genomicarray_handle_not_shared():
+    from janggu.data import GenomicArray
+    ga1 = GenomicArray()
+    ga2 = GenomicArray()
+    ga1.handle['chr1'] = np.zeros((10, 2, 1))
+    assert 'chr1' not in ga2.handle
+
+
+def test_integer_typecode_saturation():
+    iv = Interval('chr1', 0, 20)
+    for store in ['ndarray', 'sparse']:
+        ga = create_genomic_array(GenomicIndexer.create_from_genomesize({'chr1': 100}),
+                                  stranded=False, typecode='uint8',
+                                  storage=store, cache=None)
+        ga[iv, 0] = np.full((20, 1), 300)
+        np.testing.assert_equal(ga[iv], np.full((20, 1, 1), 255))
+
+    ga = create_genomic_array(GenomicIndexer.create_from_genomesize({'chr1': 100}),
+                              stranded=False, typecode='uint8',
+                              storage='ndarray', cache=None,
+                              resolution=10, collapser='sum')
+    ga[iv, 0] = np.full((20, 1), 20)
+    np.testing.assert_equal(ga[iv], np.full((2, 1, 1), 200))
+    ga[iv, 0] = np.full((20, 1), 30)
+    np.testing.assert_equal(ga[iv], np.full((2, 1, 1), 255))
+
+
+def test_genomicarray_get_set():
+    for store in ['ndarray', 'sparse']:
+        for resolution in [1, 5]:
+            ga = create_genomic_array(GenomicIndexer.create_from_genomesize({'chr1': 100}),
+                                      stranded=False, typecode='float32',
+                                      storage=store, cache=None,
+                                      resolution=resolution, collapser='max')
+            ga.set('chr1', 10, 30, 0, np.ones((20, 1)))
+            np.testing.assert_equal(ga.get('chr1', 10, 30), ga[Interval('chr1', 10, 30)])
+            np.testing.assert_equal(ga.get('chr1', 90, 110), ga[Interval('chr1', 90, 110)])
+            np.testing.assert_equal(ga.get('chr1', 10, 30).sum(), 20 // resolution)
+
+
+def test_hdf5_chunk_cache(tmpdir):
+    os.environ['JANGGU_OUTPUT'] = tmpdir.strpath
+
+    ga = create_genomic_array(GenomicIndexer.create_from_genomesize({'chr1': 10000}),
+                              stranded=False, typecode='float32',
+                              storage='hdf5', cache='chunk_cache')
+    ga[Interval('chr1', 4000, 4200), 0] = np.arange(200).reshape(200, 1)
+
+    # the region spans two chunks
+    np.testing.assert_equal(ga[Interval('chr1', 4000, 4200)][:, 0, 0], np.arange(200))
+    np.testing.assert_equal(ga[Interval('chr1', 4100, 4200)][:, 0, 0], np.arange(100, 200))
+    assert len(ga._chunk_cache) == 2
+
+    # modifying the array invalidates the cached chunks
+    ga[Interval('chr1', 4100, 4200), 0] = np.ones((100, 1))
+    np.testing.assert_equal(ga[Interval('chr1', 4100, 4200)], np.ones((100, 1, 1)))
+    np.testing.assert_equal(ga[Interval('chr1', 9950, 10050)][50:], np.zeros((50, 1, 1)))
+
+    # returned arrays do not share memory with the cached chunks
+    data = ga[Interval('chr1', 4100, 4200)]
+    data[:] = 5
+    np.testing.assert_equal(ga[Interval('chr1', 4100, 4200)], np.ones((100, 1, 1)))
+
+    # concurrent reads, e.g. by threaded workers
+    pool = ThreadPool(4)
+    starts = np.random.RandomState(0).randint(0, 9800, size=500)
+    results = pool.map(lambda start: ga.get('chr1', start, start + 200), starts)
+    pool.close()
+    for start, res in zip(starts, results):
+        np.testing.assert_equal(res, ga.handle['chr1'][start:start + 200])
+
+
+def test_genomicarray_get_stranded_bp_resolution():
+    for store in ['ndarray', 'sparse']:
+        ga = create_genomic_array(GenomicIndexer.create_from_genomesize({'chr1': 100}),
+                                  stranded=True, conditions=['a', 'b'],
+                                  typecode='float32', storage=store, cache=None)
+        value = np.arange(80).reshape(20, 2, 2)
+        ga[Interval('chr1', 80, 100), slice(None)] = value
+        np.testing.assert_equal(ga.get('chr1', 80, 100), value)
+        np.testing.assert_equal(ga.get('chr1', 90, 110)[:10], value[10:])
+        np.testing.assert_equal(ga.get('chr1', 90, 110)[10:], np.zeros((10, 2, 2)))
+
+
+def test_integer_typecode_scale(tmpdir):
+    os.environ['JANGGU_OUTPUT'] = tmpdir.strpath
+    iv = Interval('chr1', 0, 20)
+    value = np.linspace(0., 2., 20).reshape(20, 1)
+    for store in ['ndarray', 'hdf5', 'sparse']:
+        ga = create_genomic_array(GenomicIndexer.create_from_genomesize({'chr1': 100}),
+                                  stranded=False, typecode='uint16',
+                                  storage=store, cache='scale_' + store,
+                                  scale=0.01)
+        ga[iv, 0] = value
+        if store != 'sparse':
+            assert ga.handle['chr1'].dtype == np.uint16
+        np.testing.assert_equal(ga[iv].dtype, np.float32)
+        np.testing.assert_allclose(ga[iv], value[:, :, None], atol=0.005)
+        np.testing.assert_equal(ga.get('chr1', 90, 110), np.zeros((20, 1, 1)))
+
+    gsize = GenomicIndexer.create_from_genomesize({'chr1': 100})
+    with pytest.raises(ValueError):
+        create_genomic_array(gsize, typecode='float32', storage='ndarray', scale=0.01)
+    with pytest.raises(ValueError):
+        create_genomic_array(gsize, typecode='uint8', storage='ndarray', scale=0.)
+    with pytest.raises(ValueError):
+        create_genomic_array(gsize, typecode='uint8', storage='ndarray', scale=0.1,
+                             padding_value=1.)
+    with pytest.raises(ValueError):
+        create_genomic_array(gsize, typecode='uint8', storage='ndarray', scale=0.1,
+                             normalizer=['zscore'])
+
+
+def test_genomicarray_get_negative_start(tmpdir):
+    os.environ['JANGGU_OUTPUT'] = tmpdir.strpath
+    for store in ['ndarray', 'hdf5', 'sparse']:
+        for resolution in [1, 10]:
+            ga = create_genomic_array(GenomicIndexer.create_from_genomesize({'chr1': 100}),
+                                      stranded=False, typecode='float32',
+                                      storage=store, cache='neg_{}_{}'.format(store, resolution),
+                                      resolution=resolution, collapser='max')
+            ga.set('chr1', 0, 100, 0, np.ones((100, 1)))
+
+            # the region is padded on the left
+            data = ga.get('chr1', -50, 50)
+            np.testing.assert_equal(data.shape, (100 // resolution, 1, 1))
+            np.testing.assert_equal(data[:50 // resolution], 0)
+            np.testing.assert_equal(data[50 // resolution:], 1)
+            np.testing.assert_equal(ga.get('chr1', -50, -10), np.zeros((40 // resolution, 1, 1)))
+
+            # and values outside of the chromosome are not stored
+            ga.set('chr1', -50, 50, 0, 2 * np.ones((100, 1)))
+            np.testing.assert_equal(ga.get('chr1', 0, 50), 2 * np.ones((50 // resolution, 1, 1)))
+
+
+def test_ndarray_cache_numpy_parameters(tmpdir):
+    os.environ['JANGGU_OUTPUT'] = tmpdir.strpath
+
+    def loading(garray):
+        garray[Interval('chr1', 0, 20), 1] = np.ones((20, 1))
+        return garray
+
+    for _ in range(2):
+        # e.g. conditions taken from a pandas.DataFrame
+        ga = create_genomic_array(GenomicIndexer.create_from_genomesize({'chr1': 100}),
+                                  stranded=False, conditions=np.array(['a', 'b']),
+                                  typecode='float32', storage='ndarray',
+                                  cache='numpy_params', resolution=np.int64(10),
+                                  collapser='max', loader=loading)
+        np.testing.assert_equal(ga[Interval('chr1', 0, 40)][:, 0, :],
+                                [[0, 1], [0, 1], [0, 0], [0, 0]])
+
+
+def test_genomicarray_bulk_set(tmpdir):
+    os.environ['JANGGU_OUTPUT'] = tmpdir.strpath
+    signal = np.arange(200, dtype='float32').reshape(100, 2)
+    starts, ends = [0, 10, 90, 40], [20, 30, 110, 50]
+
+    for store, stranded, resolution in product(['ndarray', 'hdf5', 'sparse'],
+                                               [True, False], [1, 5]):
+        args = dict(stranded=stranded, typecode='uint8', storage=store,
+                    resolution=resolution, collapser='max')
+        ref = create_genomic_array(GenomicIndexer.create_from_genomesize({'chr1': 100}),
+                                   cache='bulk_ref_{}_{}_{}'.format(store, stranded, resolution),
+                                   **args)
+        for start, end in zip(starts, ends):
+            padded = np.zeros((end - start, 2), dtype='float32')
+            padded[:min(end, 100) - start] = signal[start:end]
+            ref.set('chr1', start, end, 0, padded)
+
+        ga = create_genomic_array(GenomicIndexer.create_from_genomesize({'chr1': 100}),
+                                  cache='bulk_{}_{}_{}'.format(store, stranded, resolution),
+                                  **args)
+        ga.bulk_set('chr1', starts, ends, 0, signal)
+        # unknown chromosomes are ignored
+        ga.bulk_set('chr2', starts, ends, 0, signal)
+
+        np.testing.assert_equal(ga.get('chr1', 0, 100), ref.get('chr1', 0, 100))
+        # values are clipped to the typecode range
+        np.testing.assert_equal(ga.get('chr1', 90, 100).max(), 199 if stranded else 255)
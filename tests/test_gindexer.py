@@ -1,3 +1,4 @@
+import copy
 import os
 
 import matplotlib
@@ -6,6 +7,8 @@ import pkg_resources
 import pytest
 import pandas as pd
 
+from pybedtools import Interval
+
 from janggu.data import GenomicIndexer
 
 matplotlib.use('AGG')
@@ -128,3 +131,160 @@ def test_gindexer_merged_variable_length_ranges():
     iv = gi[-1]
     np.testing.assert_equal((iv.chrom, iv.start, iv.end, iv.strand),
                             ('chr2', 24000, 25000, '-'))
+
+
+def test_gindexer_create_from_file_bins():
+    data_path = pkg_resources.resource_filename('janggu', 'resources/')
+
+    # sample.bed contains chr1:15000-25000 (+) and chr2:15000-25000 (-)
+    for binsize, stepsize, zero_padding, expected in [
+            (3000, 3000, True, [(15000, 18000), (18000, 21000),
+                                (21000, 24000), (24000, 25000)]),
+            (3000, 1000, True, [(15000, 18000), (16000, 19000),
+                                (17000, 20000), (18000, 21000),
+                                (19000, 22000), (20000, 23000),
+                                (21000, 24000), (22000, 25000)]),
+            (3000, 4000, True, [(15000, 18000), (19000, 22000),
+                                (23000, 25000)]),
+            (3000, 4000, False, [(15000, 18000), (19000, 22000)]),
+            (7000, 1000, False, [(15000, 22000), (16000, 23000),
+                                 (17000, 24000), (18000, 25000)]),
+            (12000, 1000, True, [])]:
+        gi = GenomicIndexer.create_from_file(
+            os.path.join(data_path, 'sample.bed'), binsize=binsize,
+            stepsize=stepsize, zero_padding=zero_padding)
+
+        expected = [('chr1', start, end, '+') for start, end in expected] + \
+                   [('chr2', start, end, '-') for start, end in expected]
+        np.testing.assert_equal([(iv.chrom, iv.start, iv.end, iv.strand) for iv in gi],
+                                expected)
+
+
+def test_gindexer_add_gindexer():
+    gi = GenomicIndexer.create_from_genomesize({'chr1': 100, 'chr2': 50})
+    gi2 = GenomicIndexer(20, 20, flank=0)
+    gi2.add_gindexer(gi)
+
+    np.testing.assert_equal(len(gi2), 8)
+    np.testing.assert_equal(gi2.idx_by_region(include='chr2'), [5, 6, 7])
+    np.testing.assert_equal(gi2.idx_by_region(include=['chr1', 'chr2'],
+                                              exclude='chr1'), [5, 6, 7])
+    np.testing.assert_equal(gi2.idx_by_region(start=30, end=70), [1, 2, 3, 6, 7])
+    np.testing.assert_equal(gi2.strand.tolist(), ['.'] * 8)
+
+    iv = gi2[7]
+    np.testing.assert_equal((iv.chrom, iv.start, iv.end, iv.strand),
+                            ('chr2', 40, 50, '.'))
+
+
+def test_gindexer_chrom_encoding():
+    gi = GenomicIndexer(10, 10)
+    gi.add_interval('chr2', 0, 20, '+')
+    gi.add_interval('chr1', 0, 10, '-')
+    gi.add_interval('chr2', 30, 40, '+')
+
+    np.testing.assert_equal(gi.chrs.tolist(), ['chr2', 'chr2', 'chr1', 'chr2'])
+    np.testing.assert_equal(gi.idx_by_region(include='chr2'), [0, 1, 3])
+    np.testing.assert_equal(gi.idx_by_region(include=['chr0', 'chr3']), [])
+    np.testing.assert_equal(gi.idx_by_region(exclude='chr3'), [0, 1, 2, 3])
+    np.testing.assert_equal(gi.idx_by_region(include=['chr2', 'chr1', 'chr2'],
+                                             exclude='chr1'), [0, 1, 3])
+
+    # the chromosome lookup must be updated when intervals are added
+    gi.add_interval('chr1', 50, 60, '+')
+    np.testing.assert_equal(gi.idx_by_region(include='chr1'), [2, 4])
+
+    gi.chrs = ['chr3', 'chr3', 'chr1', 'chr1', 'chr3']
+    np.testing.assert_equal(gi.idx_by_region(include='chr1'), [2, 3])
+    np.testing.assert_equal(gi[0].chrom, 'chr3')
+
+
+def test_gindexer_batch_access():
+    gi = GenomicIndexer.create_from_region('chr1', 0, 100, '-', 20, 10, flank=5)
+
+    for index in [slice(None), slice(2, 6), [0, 3, 8], np.array([1, 1, 7])]:
+        ivs = gi[index]
+        refidx = np.arange(len(gi))[index]
+        np.testing.assert_equal(len(ivs), len(refidx))
+        for iv, i in zip(ivs, refidx):
+            ref = gi[int(i)]
+            np.testing.assert_equal(
+                (iv['chrom'], iv['start'], iv['end'], iv['strand']),
+                (ref.chrom, ref.start, ref.end, ref.strand))
+
+    gi.random_state = 42
+    ivs = gi[:]
+    for i, iv in enumerate(ivs):
+        np.testing.assert_equal((iv['chrom'], iv['start'], iv['end']),
+                                (gi[i].chrom, gi[i].start, gi[i].end))
+
+    with pytest.raises(IndexError):
+        gi['chr1']
+
+
+def test_gindexer_idx_by_region_unsorted():
+    gi = GenomicIndexer(None, None, flank=0)
+    gi.add_intervals(['chr1', 'chr2', 'chr1', 'chr1', 'chr2'],
+                     [500, 0, 0, 100, 300],
+                     [600, 50, 1000, 200, 320],
+                     ['+', '+', '-', '+', '-'])
+
+    np.testing.assert_equal(gi.idx_by_region(include='chr1', start=150, end=550),
+                            [0, 2, 3])
+    np.testing.assert_equal(gi.idx_by_region(include='chr1', start=600), [2])
+    np.testing.assert_equal(gi.idx_by_region(start=20, end=310), [1, 2, 3, 4])
+    np.testing.assert_equal(gi.idx_by_region(exclude='chr1', end=300), [1])
+
+
+def test_gindexer_copy():
+    gi = GenomicIndexer.create_from_region('chr1', 0, 100, '+', 20, 20)
+    gi2 = copy.copy(gi)
+    gi2.starts = gi2.starts + 1
+    np.testing.assert_equal(len(gi2), len(gi))
+    np.testing.assert_equal(gi2[0].start, gi[0].start + 1)
+    np.testing.assert_equal([iv.chrom for iv in gi2], ['chr1'] * 5)
+
+
+def test_gindexer_unknown_strand(tmpdir):
+    gff = tmpdir.join('regions.gff')
+    gff.write('chr1\tjanggu\tregion\t1\t1000\t.\t?\t.\tID=r1\n')
+
+    gi = GenomicIndexer.create_from_file(gff.strpath, binsize=100, stepsize=100)
+    np.testing.assert_equal(len(gi), 10)
+    np.testing.assert_equal(set(iv.strand for iv in gi), {'?'})
+    np.testing.assert_equal(gi[:]['strand'].tolist(), ['?'] * 10)
+
+    with pytest.raises(ValueError):
+        gi.add_interval('chr1', 0, 100, 'x')
+
+
+def test_gindexer_idx_by_region_after_update():
+    gi = GenomicIndexer(10, 10)
+    gi.add_interval('chr1', 0, 10, '+')
+    gi2 = copy.copy(gi)
+    np.testing.assert_equal(gi.idx_by_region(include='chr1', start=0, end=10), [0])
+
+    # the region lookup must reflect the updated coordinates
+    gi.starts = gi.starts + 50
+    gi.ends = gi.ends + 50
+    np.testing.assert_equal(gi.idx_by_region(include='chr1', start=0, end=10), [])
+    np.testing.assert_equal(gi.idx_by_region(include='chr1', start=50, end=60), [0])
+
+    np.testing.assert_equal(gi2.idx_by_region(include='chr1', start=0, end=10), [0])
+    gi2.ends = [100]
+    np.testing.assert_equal(gi2.idx_by_region(include='chr1', start=90, end=95), [0])
+
+
+def test_gindexer_int_access_after_update():
+    gi = GenomicIndexer(10, 10, flank=2)
+    gi.add_interval('chr1', 0, 20, '+')
+    np.testing.assert_equal(str(gi[1]), str(Interval('chr1', 8, 22, strand='+')))
+
+    gi.starts = gi.starts + 10
+    gi.ends = gi.ends + 10
+    gi.strand = ['-', '-']
+    gi.chrs = ['chr2', 'chr2']
+    np.testing.assert_equal(str(gi[np.int64(1)]), str(Interval('chr2', 18, 32, strand='-')))
+
+    gi.add_interval('chr3', 0, 10, '.')
+    np.testing.assert_equal(str(gi[-1]), str(Interval('chr3', 0, 12, strand='.')))